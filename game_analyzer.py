@@ -1,14 +1,25 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
-from dateutil import parser
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve as sv
+import xxhash
 import os
+import gzip
+import hashlib
 import sqlite3
 import logging
 import re
+import threading
+import time
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Configure logging
 LOG_FILE = 'game_analyzer.log'
@@ -18,138 +29,370 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-CACHE_FILE = 'wishlist_cache.csv'
+CACHE_FILE = 'wishlist_cache.parquet' # Typed, compressed columnar cache
+GAME_SCHEMA = pa.schema([ # Columns of a scraped game, in cache file order, with the narrowest fitting types
+    ('title', pa.string()),
+    ('current_price', pa.float32()),
+    ('detail_url', pa.string()),
+    ('metascore', pa.int16()), # 0-100
+    ('openscore', pa.int16()), # 0-100
+    ('steam_score', pa.float32()),
+    ('last_discount', pa.string()),
+    ('avg_days_between_discounts', pa.float32()),
+    ('days_since_last_discount', pa.int32()),
+])
+# The same compact types on the pandas side, for data loaded from the database
+GAME_DTYPES = {
+    'current_price': 'float32',
+    'metascore': 'Int16',
+    'openscore': 'Int16',
+    'steam_score': 'float32',
+    'avg_days_between_discounts': 'float32',
+    'days_since_last_discount': 'Int32',
+}
+# Compact dtypes of the price, score and day columns analyze_and_recommend returns, whatever the input types
+RECOMMENDATION_DTYPES = {
+    'current_price': 'float32',
+    'metascore': 'Int16',
+    'openscore': 'Int16',
+    'steam_score': 'float32',
+    'avg_score': 'float32',
+    'recommendation_score': 'float32',
+    'days_since_last_discount': 'Int16',
+    'avg_days_between_discounts': 'float32',
+}
+# Map Arrow integer columns to pandas nullable integers rather than float64 when values are missing
+NULLABLE_INT_DTYPES = {pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype()}
 CACHE_DIR = 'html_cache'
+STEAMDB_CACHE_PREFIX = 'steamdb_' # Keeps SteamDB pages apart from DekuDeals pages in CACHE_DIR
 DATABASE_FILE = 'game_database.db'
+GAMES_SNAPSHOT_FILE = 'games.parquet' # Columnar copy of the games table; loads much faster than reading rows through SQLite
+DB_GAME_SCHEMA = GAME_SCHEMA.remove(GAME_SCHEMA.get_field_index('detail_url')) # Columns stored in the games table
+SNAPSHOT_VERSION_KEY = b'game_data_version' # Snapshot metadata entry holding the game_data_version it was taken at
+ANALYSIS_VERSION = 3 # Bump when analyze_and_recommend's output changes so persisted recommendations are recomputed
+SCRAPE_WORKERS = 12 # Concurrent detail page scrapes
+REQUEST_TIMEOUT = 15 # Seconds
+REQUEST_SLOTS = 8 # Requests in flight across all scrape workers and sessions; the politeness limit instead of sleeping
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    # Only advertise encodings the installed urllib3 can decode (adds br/zstd when available)
+    'Accept-Encoding': requests.utils.DEFAULT_ACCEPT_ENCODING,
+}
+PARSER = 'lxml' # Considerably faster than the pure-Python 'html.parser'
+
+# Patterns used for every scraped game, compiled once
+PRICE_CLEAN_RE = re.compile(r'[^\d,.]') # Everything but digits, comma and dot
+PERCENT_RE = re.compile(r'([\d.]+)%')
+
+# CSS selectors, compiled once instead of on every select call
+CARD_SELECTOR = sv.compile('.list-view')
+CARD_TITLE_SELECTOR = sv.compile('.main-link h6')
+CARD_LINK_SELECTOR = sv.compile('.main-link')
+SCORE_ITEM_SELECTOR = sv.compile('li.list-group-item')
+PRICE_HISTORY_SELECTOR = sv.compile('.price-history table')
+NEXT_PAGE_SELECTOR = sv.compile('a.page-link[rel="next"]')
+ACTIVE_PAGE_SELECTOR = sv.compile('li.page-item.active span.page-link')
+PAGE_LINK_SELECTOR = sv.compile('a.page-link')
+STEAMDB_RESULT_SELECTOR = sv.compile('.app a')
+STEAM_REVIEWS_SELECTOR = sv.compile('a[href*="#reviews"]')
+
+# Detail page list labels and the game fields their scores are stored in
+SCORE_LABELS = {'Metacritic': 'metascore', 'OpenCritic': 'openscore'}
+
+def class_strainer(*class_names):
+    """Build a SoupStrainer matching elements that carry any of the given CSS classes"""
+    pattern = '|'.join(re.escape(name) for name in class_names)
+    return SoupStrainer(class_=re.compile(rf'(?:^|\s)(?:{pattern})(?:\s|$)'))
+
+# Only build the parts of each page we actually read; skips scripts, sidebars, footers, etc.
+LISTING_STRAINER = class_strainer('list-view', 'page-item') # Game cards and pagination
+DETAIL_STRAINER = class_strainer('list-group-item', 'price-history') # Scores and price history
+STEAMDB_SEARCH_STRAINER = class_strainer('app') # Search result rows
+STEAMDB_APP_STRAINER = SoupStrainer('a', href=re.compile('#reviews')) # Review summary link
+
+# Columns shown in each results table, shared by the tables that show them; like every module global they are rebuilt on each rerun
+DISPLAY_COLS = [
+    'title', 'current_price', 'avg_score',
+    'days_since_last_discount', 'avg_days_between_discounts',
+    'recommendation_score'
+]
+VALUE_COLS = ['title', 'current_price', 'avg_score', 'recommendation_score'] # Best value and good deals
+DISCOUNT_COLS = ['title', 'current_price', 'days_since_last_discount', 'avg_days_between_discounts']
+RATED_COLS = ['title', 'current_price', 'metascore', 'openscore', 'steam_score', 'avg_score']
+# Display precision for the tables; columns a table doesn't have are ignored
+COLUMN_CONFIG = {
+    'current_price': st.column_config.NumberColumn(format='ARS$%.2f'),
+    'steam_score': st.column_config.NumberColumn(format='%.1f'),
+    'avg_score': st.column_config.NumberColumn(format='%.1f'),
+    'avg_days_between_discounts': st.column_config.NumberColumn(format='%.1f'),
+    'recommendation_score': st.column_config.NumberColumn(format='%.3f'),
+}
+
+def create_session():
+    """Create an HTTP session that reuses pooled keep-alive connections and retries transient failures"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32, # Must cover SCRAPE_WORKERS so concurrent requests don't discard connections
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+@st.cache_resource(show_spinner=False)
+def request_slots():
+    """The process-wide request semaphore; module globals are rebuilt on every rerun, so it lives in the resource cache"""
+    return threading.BoundedSemaphore(REQUEST_SLOTS)
+
+def fetch_html(session, url):
+    """Fetch a page's HTML, waiting for a free request slot first"""
+    with request_slots():
+        response = session.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.text
+
+def open_database():
+    """Open the game database, creating the schema if needed"""
+    conn = sqlite3.connect(DATABASE_FILE)
+    # WAL lets readers proceed during writes; NORMAL sync is safe in WAL mode and avoids an fsync per commit
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    create_database(conn)
+    return conn
 
-def create_database():
+def create_database(conn):
     """Create the game database if it doesn't exist"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS games (
             title TEXT PRIMARY KEY,
             current_price REAL,
             metascore INTEGER,
             openscore INTEGER,
-            steam_score INTEGER,
+            steam_score REAL,
             last_discount TEXT,
             avg_days_between_discounts REAL,
-            days_since_last_discount INTEGER
+            days_since_last_discount INTEGER,
+            updated_at REAL
+        )
+    ''')
+    # Databases created before updated_at existed get the column added; their rows keep NULL until next saved
+    if 'updated_at' not in {row[1] for row in conn.execute('PRAGMA table_info(games)')}:
+        conn.execute('ALTER TABLE games ADD COLUMN updated_at REAL')
+    # Lets game_data_version find the latest update without scanning the table
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_games_updated_at ON games(updated_at)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recommendations_cache (
+            raw_hash BLOB PRIMARY KEY,
+            payload BLOB,
+            created_at INTEGER
         )
     ''')
     conn.commit()
-    conn.close()
 
-def game_exists_in_db(title):
-    """Check if a game already exists in the database"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM games WHERE title=?", (title,))
-    exists = cursor.fetchone() is not None
-    conn.close()
-    return exists
-
-def save_game_to_db(game):
-    """Save a game's data to the database"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+def save_games_to_db(columns, conn):
+    """Save a batch of games, given as a dict of column lists, to the database in a single transaction"""
+    rows = list(zip(
+        columns['title'], columns['current_price'], columns['metascore'], columns['openscore'],
+        columns['steam_score'], columns['last_discount'], columns['avg_days_between_discounts'],
+        columns['days_since_last_discount'], repeat(time.time())
+    ))
     try:
-        cursor.execute(
+        # Take the write lock up front, then upsert in place rather than delete + re-insert like INSERT OR REPLACE
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(
             '''
-            INSERT OR REPLACE INTO games (
+            INSERT INTO games (
                 title, current_price, metascore, openscore, steam_score, 
-                last_discount, avg_days_between_discounts, days_since_last_discount
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                last_discount, avg_days_between_discounts, days_since_last_discount, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(title) DO UPDATE SET
+                current_price = excluded.current_price,
+                metascore = excluded.metascore,
+                openscore = excluded.openscore,
+                steam_score = excluded.steam_score,
+                last_discount = excluded.last_discount,
+                avg_days_between_discounts = excluded.avg_days_between_discounts,
+                days_since_last_discount = excluded.days_since_last_discount,
+                updated_at = excluded.updated_at
             ''',
-            (
-                game['title'], game['current_price'], game['metascore'], game['openscore'],
-                game['steam_score'], game['last_discount'], game['avg_days_between_discounts'],
-                game['days_since_last_discount']
-            )
+            rows
         )
         conn.commit()
-        logging.info(f"Saved game to database: {game['title']}")
+        logging.info(f"Saved {len(rows)} games to database: {', '.join(columns['title'])}")
     except Exception as e:
-        logging.error(f"Error saving game to database: {game['title']}: {e}, Game data: {game}")
-    finally:
-        conn.close()
+        conn.rollback()
+        logging.error(f"Error saving games to database: {e}, Games data: {columns}")
+
+def load_recommendations(raw_hash, conn):
+    """Load persisted recommendations for the given raw data hash, or None if there are none"""
+    try:
+        row = conn.execute("SELECT payload FROM recommendations_cache WHERE raw_hash = ?", (raw_hash,)).fetchone()
+        if row is not None:
+            return pa.ipc.deserialize_pandas(row[0])
+    except Exception as e:
+        logging.warning(f"Could not load persisted recommendations: {e}")
+    return None
 
-def get_html_cache_filename(url):
-    """Generate a cache filename from the URL"""
-    return os.path.join(CACHE_DIR, f'{url.replace("/", "_").replace(":", "_")}.html')
+def read_latest_recommendations():
+    """Load the most recently persisted recommendations with their raw data hash, on a connection of its own.
 
-def get_html_from_cache(url):
-    """Retrieve HTML content from the cache file"""
-    cache_file = get_html_cache_filename(url)
-    if os.path.exists(cache_file):
+    Needs no key, so it can run in a background thread while the raw data it will be checked against loads.
+    Returns None if there are none.
+    """
+    try:
+        conn = sqlite3.connect(DATABASE_FILE)
         try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            logging.error(f"Error reading cache file {cache_file}: {e}")
+            row = conn.execute(
+                "SELECT raw_hash, payload FROM recommendations_cache ORDER BY created_at DESC LIMIT 1"
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is not None:
+            return row[0], pa.ipc.deserialize_pandas(row[1])
+    except Exception as e:
+        logging.warning(f"Could not prefetch persisted recommendations: {e}")
     return None
 
-def save_html_to_cache(url, html_content):
-    """Save HTML content to the cache file"""
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    cache_file = get_html_cache_filename(url)
+def save_recommendations(raw_hash, recommendations, conn):
+    """Persist recommendations for the given raw data hash, replacing any older entry"""
     try:
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        logging.info(f"HTML saved to cache: {cache_file}")
+        payload = pa.ipc.serialize_pandas(recommendations).to_pybytes()
+        conn.execute('BEGIN IMMEDIATE')
+        # Only the latest wishlist snapshot is ever looked up again
+        conn.execute("DELETE FROM recommendations_cache WHERE raw_hash != ?", (raw_hash,))
+        conn.execute(
+            "INSERT OR REPLACE INTO recommendations_cache (raw_hash, payload, created_at) VALUES (?, ?, ?)",
+            (raw_hash, payload, int(time.time()))
+        )
+        conn.commit()
     except Exception as e:
-        logging.error(f"Error saving HTML to cache file {cache_file}: {e}")
+        conn.rollback()
+        logging.error(f"Error saving recommendations to database: {e}")
+
+def ensure_game_dtypes(df):
+    """Convert the numeric game columns to their compact dtypes in one pass; missing prices become 0"""
+    for col, dtype in GAME_DTYPES.items():
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    df['current_price'] = df['current_price'].fillna(0)
+    return df
+
+def read_game_cache(path, columns=None):
+    """Read a Parquet game cache, keeping integer columns with missing values as nullable integers"""
+    return pq.read_table(path, columns=columns).to_pandas(types_mapper=NULLABLE_INT_DTYPES.get)
+
+def save_games_snapshot(df, version):
+    """Write the games table snapshot tagged with its data version, replacing the old one only once the new file is complete"""
+    tmp_file = GAMES_SNAPSHOT_FILE + '.tmp'
+    try:
+        table = pa.Table.from_pandas(df, schema=DB_GAME_SCHEMA, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), SNAPSHOT_VERSION_KEY: version})
+        pq.write_table(table, tmp_file, compression='zstd')
+        os.replace(tmp_file, GAMES_SNAPSHOT_FILE)
+    except Exception as e:
+        logging.error(f"Error saving games snapshot: {e}")
+
+def snapshot_version(data_version):
+    """The snapshot metadata value for a game_data_version"""
+    return repr(tuple(data_version)).encode('utf-8')
+
+def read_games_snapshot(version):
+    """The games snapshot if it was taken at the given snapshot_version, otherwise None"""
+    try:
+        if (pq.read_schema(GAMES_SNAPSHOT_FILE).metadata or {}).get(SNAPSHOT_VERSION_KEY) == version:
+            return read_game_cache(GAMES_SNAPSHOT_FILE, columns=DB_GAME_SCHEMA.names)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Could not read games snapshot, reading the database instead: {e}")
+    return None
 
-def get_steamdb_cache_filename(url):
-    """Generate a cache filename for SteamDB URLs"""
-    return os.path.join(CACHE_DIR, f'steamdb_{url.replace("/", "_").replace(":", "_")}.html')
+def read_games_table(conn, data_version=None):
+    """Read the games table, from its Parquet snapshot when that was taken at the current game_data_version.
+
+    Pass the game_data_version the caller already read to skip probing it again when the snapshot matches.
+    """
+    checked = None
+    if data_version is not None:
+        checked = snapshot_version(data_version)
+        df = read_games_snapshot(checked)
+        if df is not None:
+            return df
+    # One read transaction, so the version and the rows it tags come from the same database state
+    conn.execute('BEGIN')
+    try:
+        version = snapshot_version(game_data_version(conn))
+        if version != checked: # The data changed since the caller's probe
+            df = read_games_snapshot(version)
+            if df is not None:
+                return df
+        df = ensure_game_dtypes(pd.read_sql_query(f"SELECT {', '.join(DB_GAME_SCHEMA.names)} FROM games", conn))
+    finally:
+        conn.commit()
+    save_games_snapshot(df, version)
+    return df
 
-def get_steamdb_html_from_cache(url):
-    """Retrieve SteamDB HTML content from the cache file"""
-    cache_file = get_steamdb_cache_filename(url)
+def html_cache_path(url, prefix=''):
+    """Generate a fixed-length cache filename from a hash of the URL"""
+    url_hash = hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, f'{prefix}{url_hash}.html.gz')
+
+def html_cache_get(url, prefix=''):
+    """Retrieve cached HTML content for a URL, or None if it isn't cached"""
+    cache_file = html_cache_path(url, prefix)
     if os.path.exists(cache_file):
         try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
+            with gzip.open(cache_file, 'rt', encoding='utf-8') as f:
                 return f.read()
         except Exception as e:
-            logging.error(f"Error reading SteamDB cache file {cache_file}: {e}")
+            logging.error(f"Error reading cache file {cache_file}: {e}")
     return None
 
-def save_steamdb_html_to_cache(url, html_content):
-    """Save SteamDB HTML content to the cache file"""
+def html_cache_put(url, html_content, prefix=''):
+    """Save HTML content for a URL to the cache"""
     os.makedirs(CACHE_DIR, exist_ok=True)
-    cache_file = get_steamdb_cache_filename(url)
+    cache_file = html_cache_path(url, prefix)
     try:
-        with open(cache_file, 'w', encoding='utf-8') as f:
+        with gzip.open(cache_file, 'wt', encoding='utf-8') as f:
             f.write(html_content)
-        logging.info(f"SteamDB HTML saved to cache: {cache_file}")
+        logging.info(f"HTML saved to cache: {cache_file}")
     except Exception as e:
-        logging.error(f"Error saving SteamDB HTML to cache file {cache_file}: {e}")
+        logging.error(f"Error saving HTML to cache file {cache_file}: {e}")
+
+def log_response_content(html_content, soup):
+    """Log the size of a page that had no usable data; the parsed markup itself only at DEBUG level"""
+    logging.warning(f"Response content length: {len(html_content)}")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Response content: {soup.prettify()}")
 
-def search_steamdb(game_title):
+def search_steamdb(game_title, session):
     """Search SteamDB for the game and return the app ID"""
+    try:
+        return cached_search_steamdb(game_title, session)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error searching SteamDB for {game_title}: {e}")
+        return None
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def cached_search_steamdb(game_title, _session):
+    """Memoized SteamDB search; request errors propagate so that failures are never cached"""
     search_url = f'https://steamdb.info/search/?a=app&q={game_title}'
     logging.info(f"Searching SteamDB for {game_title} using URL: {search_url}")
 
     # Check if HTML is cached
-    html_content = get_steamdb_html_from_cache(search_url)
+    html_content = html_cache_get(search_url, STEAMDB_CACHE_PREFIX)
     if html_content:
         logging.info(f"Loading SteamDB search HTML from cache for {search_url}")
-        soup = BeautifulSoup(html_content, 'html.parser')
     else:
-        try:
-            response = requests.get(search_url)
-            response.raise_for_status()
-            html_content = response.text
-            save_steamdb_html_to_cache(search_url, html_content)
-            soup = BeautifulSoup(html_content, 'html.parser')
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error searching SteamDB for {game_title}: {e}")
-            return None
+        html_content = fetch_html(_session, search_url)
+        html_cache_put(search_url, html_content, STEAMDB_CACHE_PREFIX)
+    soup = BeautifulSoup(html_content, PARSER, parse_only=STEAMDB_SEARCH_STRAINER)
 
     # Find the first search result
-    result_link = soup.select_one('.app a')
+    result_link = STEAMDB_RESULT_SELECTOR.select_one(soup)
     if result_link:
         app_id = result_link['href'].split('/')[2]
         logging.info(f"Found SteamDB app ID {app_id} for {game_title}")
@@ -157,40 +400,42 @@ def search_steamdb(game_title):
     else:
         logging.warning(f"No SteamDB search results found for {game_title}")
         logging.warning(f"Full search URL: {search_url}")
-        logging.warning(f"Response content: {soup.prettify()}")
+        log_response_content(html_content, soup)
         return None
 
-def get_steam_rating(app_id):
+def get_steam_rating(app_id, session):
     """Get the Steam rating from the SteamDB app page"""
     if not app_id:
         return None
 
+    try:
+        return cached_get_steam_rating(app_id, session)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching SteamDB app page for {app_id}: {e}")
+        return None
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def cached_get_steam_rating(app_id, _session):
+    """Memoized Steam rating lookup; request errors propagate so that failures are never cached"""
     app_url = f'https://steamdb.info/app/{app_id}/'
     logging.info(f"Fetching Steam rating for app ID {app_id} from URL: {app_url}")
 
     # Check if HTML is cached
-    html_content = get_steamdb_html_from_cache(app_url)
+    html_content = html_cache_get(app_url, STEAMDB_CACHE_PREFIX)
     if html_content:
         logging.info(f"Loading SteamDB app HTML from cache for {app_url}")
-        soup = BeautifulSoup(html_content, 'html.parser')
     else:
-        try:
-            response = requests.get(app_url)
-            response.raise_for_status()
-            html_content = response.text
-            save_steamdb_html_to_cache(app_url, html_content)
-            soup = BeautifulSoup(html_content, 'html.parser')
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching SteamDB app page for {app_id}: {e}")
-            return None
+        html_content = fetch_html(_session, app_url)
+        html_cache_put(app_url, html_content, STEAMDB_CACHE_PREFIX)
+    soup = BeautifulSoup(html_content, PARSER, parse_only=STEAMDB_APP_STRAINER)
 
     # Find the review element
-    review_element = soup.select_one('a[href*="#reviews"]')
+    review_element = STEAM_REVIEWS_SELECTOR.select_one(soup)
     if review_element:
         # Extract the rating from the aria-label attribute
         aria_label = review_element.get('aria-label')
         if aria_label:
-            match = re.search(r'([\d\.]+)%', aria_label)
+            match = PERCENT_RE.search(aria_label)
             if match:
                 steam_score = match.group(1)
                 logging.info(f"Extracted Steam score {steam_score} for app ID {app_id}")
@@ -198,27 +443,175 @@ def get_steam_rating(app_id):
         else:
             logging.warning(f"No aria-label found on SteamDB for app ID {app_id}")
             logging.warning(f"Full app URL: {app_url}")
-            logging.warning(f"Response content: {soup.prettify()}")
+            log_response_content(html_content, soup)
             return None
     else:
         logging.warning(f"No Steam rating found on SteamDB for app ID {app_id}")
         logging.warning(f"Full app URL: {app_url}")
-        logging.warning(f"Response content: {soup.prettify()}")
+        log_response_content(html_content, soup)
         return None
 
-def get_game_data(base_url, force_refresh=False):
-    """Get game data, prioritizing database, then cache, then web scraping."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-    }
+def process_card(card, title, session):
+    """Scrape price, scores and price history for a single wishlist card. Returns None if the game should be skipped."""
+    game = {'title': title}
 
-    session = requests.Session()
-    all_games = []
+    # Get current price
+    price_elem = card.find('strong')
+    if price_elem:
+        price_text = price_elem.get_text(strip=True)
+        # 1. Remove currency symbols (like ARS$, $, €) and whitespace
+        # Keep digits, comma, and dot for now
+        cleaned_price_str = PRICE_CLEAN_RE.sub('', price_text)
+
+        try:
+            # Check if the original cleaned string contained a comma (decimal separator)
+            if ',' in cleaned_price_str:
+                # Treat '.' as thousands, ',' as decimal
+                numeric_str = cleaned_price_str.replace('.', '').replace(',', '.')
+                game['current_price'] = float(numeric_str) if numeric_str else 0.0
+            # Check if the original cleaned string contained a dot but no comma (e.g., $19.99)
+            elif '.' in cleaned_price_str:
+                 # Treat '.' as decimal, ignore potential thousands commas if any were missed (shouldn't happen with current regex)
+                 numeric_str = cleaned_price_str.replace(',', '') # Remove commas if any snuck in
+                 game['current_price'] = float(numeric_str) if numeric_str else 0.0
+            # Only digits found (e.g., "1135000")
+            elif cleaned_price_str.isdigit():
+                # Assume last two digits are decimals
+                if len(cleaned_price_str) >= 2:
+                    numeric_str = cleaned_price_str[:-2] + '.' + cleaned_price_str[-2:]
+                    game['current_price'] = float(numeric_str)
+                elif len(cleaned_price_str) == 1:
+                    # Treat single digit as dollars/euros/etc. (e.g., "5")
+                    game['current_price'] = float(cleaned_price_str)
+                else: # Empty string after cleaning
+                    game['current_price'] = 0.0
+            else: # Handle cases where cleaning resulted in non-standard format
+                 game['current_price'] = 0.0
+                 st.warning(f"Could not parse price for {game['title']} from text '{price_text}' (cleaned: '{cleaned_price_str}' - unexpected format)")
+                 logging.warning(f"Could not parse price for {game['title']} from text '{price_text}' (cleaned: '{cleaned_price_str}' - unexpected format)")
+
+        except ValueError:
+            game['current_price'] = 0.0
+            st.warning(f"Could not parse price for {game['title']} from text '{price_text}' (cleaned: '{cleaned_price_str}') - ValueError")
+            logging.warning(f"Could not parse price for {game['title']} from text '{price_text}' (cleaned: '{cleaned_price_str}') - ValueError")
+    else:
+        game['current_price'] = 0.0
+        st.warning(f"No price found for {game['title']}")
+        logging.warning(f"No price found for {game['title']}")
 
-    # Create database if it doesn't exist
-    create_database()
+    # Get game detail URL
+    detail_elem = CARD_LINK_SELECTOR.select_one(card)
+    if detail_elem and detail_elem.get('href'):
+        detail_url = f"https://www.dekudeals.com{detail_elem['href']}"
+        game['detail_url'] = detail_url
+
+        try:
+            # --- Detail Page Scraping ---
+            detail_html = None
+            # Check cache first even in refresh mode for detail pages to speed up
+            detail_html_cache = html_cache_get(detail_url)
+            if detail_html_cache:
+                 detail_soup = BeautifulSoup(detail_html_cache, PARSER, parse_only=DETAIL_STRAINER)
+            else:
+                 detail_html = fetch_html(session, detail_url)
+                 html_cache_put(detail_url, detail_html) # Cache detail page
+                 detail_soup = BeautifulSoup(detail_html, PARSER, parse_only=DETAIL_STRAINER)
+
+            # Scores: walk the detail list once and dispatch on each item's label
+            game['metascore'] = None
+            game['openscore'] = None
+            for item in SCORE_ITEM_SELECTOR.select(detail_soup):
+                label_elem = item.strong
+                if not label_elem:
+                    continue
+                label = label_elem.get_text(strip=True)
+                score_key = next((key for name, key in SCORE_LABELS.items() if name in label), None)
+                if not score_key or game[score_key] is not None:
+                    continue
+                score_elem = label_elem.find_next_sibling() # The score link follows its label
+                if score_elem is not None and score_elem.name == 'a':
+                    score_text = score_elem.get_text(strip=True)
+                    game[score_key] = int(score_text) if score_text.isdigit() else None
+
+            # Steam Score (consider caching results here too)
+            app_id = search_steamdb(game['title'], session) # search_steamdb uses its own cache
+            steam_score_str = get_steam_rating(app_id, session) # get_steam_rating uses its own cache
+            game['steam_score'] = float(steam_score_str) if steam_score_str else None
+
+            # Price History
+            game['last_discount'] = None
+            game['avg_days_between_discounts'] = None
+            game['days_since_last_discount'] = None
+            history_table = PRICE_HISTORY_SELECTOR.select_one(detail_soup)
+            if history_table:
+                # Collect the first cell of every row (skipping the header) and parse all dates in one call
+                date_cells = (row.find('td') for row in history_table.find_all('tr')[1:])
+                date_strs = pd.Series([cell.get_text(strip=True) for cell in date_cells if cell], dtype=object)
+                parsed_dates = pd.to_datetime(date_strs, format='mixed', errors='coerce') # Rows mix date formats; inferring one from the first row would turn the rest into NaT
+                for date_str in date_strs[parsed_dates.isna() & (date_strs != '')]:
+                    logging.warning(f"Could not parse date '{date_str}' for {game['title']}")
+                dates = parsed_dates.dropna().sort_values(ascending=False).to_numpy()
+                if dates.size:
+                    last_discount = pd.Timestamp(dates[0])
+                    game['last_discount'] = last_discount.strftime('%Y-%m-%d')
+                    game['days_since_last_discount'] = (pd.Timestamp.now() - last_discount).days
+                    # Whole days between consecutive discounts, newest first
+                    diff_days = -np.diff(dates) // np.timedelta64(1, 'D')
+                    diff_days = diff_days[diff_days >= 0] # Ensure positive diff
+                    if diff_days.size:
+                         game['avg_days_between_discounts'] = float(diff_days.mean())
+            else:
+                st.warning(f"No price history table found for {game['title']}")
+                logging.warning(f"No price history table found for {game['title']}")
+
+        except requests.exceptions.RequestException as e:
+            st.error(f"Error fetching detail page for {game['title']}: {e}")
+            logging.error(f"Error fetching detail page for {game['title']}: {e}")
+            # Don't add game if details failed, but maybe log it?
+            return None # Skip adding this game
+        except Exception as detail_e:
+             st.error(f"Error processing details for {game['title']}: {detail_e}")
+             logging.error(f"Error processing details for {game['title']}: {detail_e}")
+             return None # Skip adding this game
+    else:
+        st.warning(f"No detail URL found for game card: {game.get('title', 'N/A')}")
+        logging.warning(f"No detail URL found for game card: {game.get('title', 'N/A')}")
+        # Decide if you want to add games without details
+        # game['metascore'] = None ... etc.
+        return None # Skip adding this game for now
+
+    return game
+
+def game_data_version(conn):
+    """Row count and latest update time of the games table in a single query; changes whenever its rows do"""
+    return conn.execute("SELECT (SELECT COUNT(1) FROM games), (SELECT MAX(updated_at) FROM games)").fetchone()
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_game_data(base_url, force_refresh, data_version, _conn=None):
+    """get_game_data memoized across reruns; data_version (see game_data_version) only keys the cache so database changes reload.
+
+    Status messages are replayed on cache hits.
+    """
+    return get_game_data(base_url, force_refresh=force_refresh, _conn=_conn, data_version=data_version)
+
+def get_game_data(base_url, force_refresh=False, _conn=None, data_version=None):
+    """Get game data, prioritizing database, then cache, then web scraping.
+
+    Pass an open connection as _conn to reuse it; it is left open for the caller.
+    Pass the game_data_version already read on it as data_version so the games table isn't probed again.
+    """
+    if _conn is not None:
+        return fetch_game_data(base_url, force_refresh, _conn, data_version)
+    # One connection for the whole run instead of one per lookup/save
+    conn = open_database()
+    try:
+        return fetch_game_data(base_url, force_refresh, conn, data_version)
+    finally:
+        conn.close()
+
+def fetch_game_data(base_url, force_refresh, conn, data_version=None):
+    """Does the work of get_game_data using an already open database connection."""
+    session = create_session()
 
     # --- Loading Logic ---
     if not force_refresh:
@@ -226,22 +619,14 @@ def get_game_data(base_url, force_refresh=False):
         st.write("Attempting to load data from database...")
         logging.info("Attempting to load data from database...")
         try:
-            conn = sqlite3.connect(DATABASE_FILE)
-            # Check if the table is empty first
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM games")
-            count = cursor.fetchone()[0]
-            if count > 0:
-                df = pd.read_sql_query("SELECT * FROM games", conn)
-                conn.close()
+            # Check if the table is empty first, reusing the caller's probe when there was one
+            if data_version is None:
+                data_version = game_data_version(conn)
+            if data_version[0] > 0:
+                df = read_games_table(conn, data_version) # Already converted to the compact game dtypes
                 if not df.empty:
                     st.success("Data loaded successfully from database.")
                     logging.info("Data loaded successfully from database.")
-                    # Ensure correct types after loading from DB
-                    df['current_price'] = pd.to_numeric(df['current_price'], errors='coerce').fillna(0)
-                    for col in ['metascore', 'openscore', 'steam_score', 'days_since_last_discount']:
-                         df[col] = pd.to_numeric(df[col], errors='coerce')
-                    df['avg_days_between_discounts'] = pd.to_numeric(df['avg_days_between_discounts'], errors='coerce')
                     return df
                 else:
                     st.write("Database table exists but is empty.")
@@ -249,36 +634,30 @@ def get_game_data(base_url, force_refresh=False):
             else:
                  st.write("Database table is empty.")
                  logging.info("Database table is empty.")
-            conn.close()
         except Exception as e:
             st.warning(f"Could not load from database: {e}")
             logging.warning(f"Could not load from database: {e}")
 
-        # 2. Try loading from CSV Cache (as fallback if DB fails/is empty)
-        st.write("Attempting to load data from CSV cache...")
-        logging.info("Attempting to load data from CSV cache...")
+        # 2. Try loading from Parquet Cache (as fallback if DB fails/is empty)
+        st.write("Attempting to load data from Parquet cache...")
+        logging.info("Attempting to load data from Parquet cache...")
         if os.path.exists(CACHE_FILE):
             try:
-                df = pd.read_csv(CACHE_FILE)
+                df = read_game_cache(CACHE_FILE) # Column types are stored with the data, no conversion needed
                 # Basic validation
                 if not df.empty and 'title' in df.columns:
-                     st.success("Data loaded successfully from CSV cache.")
-                     logging.info("Data loaded successfully from CSV cache.")
-                     # Ensure correct types after loading from CSV
-                     df['current_price'] = pd.to_numeric(df['current_price'], errors='coerce').fillna(0)
-                     for col in ['metascore', 'openscore', 'steam_score', 'days_since_last_discount']:
-                          df[col] = pd.to_numeric(df[col], errors='coerce')
-                     df['avg_days_between_discounts'] = pd.to_numeric(df['avg_days_between_discounts'], errors='coerce')
+                     st.success("Data loaded successfully from Parquet cache.")
+                     logging.info("Data loaded successfully from Parquet cache.")
                      return df
                 else:
-                     st.warning("CSV cache file is empty or invalid.")
-                     logging.warning("CSV cache file is empty or invalid.")
+                     st.warning("Parquet cache file is empty or invalid.")
+                     logging.warning("Parquet cache file is empty or invalid.")
             except Exception as e:
-                st.warning(f"Error loading CSV cache: {e}")
-                logging.warning(f"Error loading CSV cache: {e}")
+                st.warning(f"Error loading Parquet cache: {e}")
+                logging.warning(f"Error loading Parquet cache: {e}")
         else:
-            st.write("CSV cache file not found.")
-            logging.info("CSV cache file not found.")
+            st.write("Parquet cache file not found.")
+            logging.info("Parquet cache file not found.")
 
         # If both DB and Cache fail or are empty, proceed to scrape
         st.write("No data found in database or cache. Proceeding to fetch from web.")
@@ -291,225 +670,120 @@ def get_game_data(base_url, force_refresh=False):
         logging.info("Fetching data from web...")
         page = 1
         games_processed_count = 0
-        while True:
-            st.write(f"Fetching page {page}...")
-            url = f"{base_url}?page={page}" if page > 1 else base_url
-
-            # Always fetch from web when force_refresh is True
-            st.write(f"Fetching HTML from {url}")
-            logging.info(f"Fetching HTML from {url}")
-            try:
-                st.write(f"Sending GET request to: {url}")
-                response = session.get(url, headers=headers, timeout=15) # Added timeout
-                response.raise_for_status()
-                st.write(f"Received response with status code: {response.status_code}")
-                html_content = response.text
-                save_html_to_cache(url, html_content) # Save fetched HTML
-                soup = BeautifulSoup(html_content, 'html.parser')
-            except requests.exceptions.RequestException as e:
-                st.error(f"Error fetching page {page}: {e}")
-                logging.error(f"Error fetching page {page}: {e}")
-                break # Stop if a page fails
-
-            game_cards = soup.select('.list-view')
-            st.write(f"Found {len(game_cards)} game cards on page {page}")
-            logging.info(f"Found {len(game_cards)} game cards on page {page}")
-
-            if not game_cards:
-                st.write("No more game cards found, stopping.")
-                logging.info("No more game cards found, stopping.")
-                break
-
-            for card in game_cards:
-                game = {}
-                title_elem = card.select_one('.main-link h6')
-                if not title_elem:
-                    st.warning("Skipping card: No title found.")
-                    logging.warning("Skipping card: No title found.")
-                    continue
-                game['title'] = title_elem.text.strip()
-
-                # --- Check DB *before* scraping details ---
-                # This prevents re-scraping details for games already saved.
-                if game_exists_in_db(game['title']):
-                    st.write(f"Skipping game (already in database): {game['title']}")
-                    logging.info(f"Skipping game (already in database): {game['title']}")
-                    continue # Skip to the next card
-
-                st.write(f"Processing game: {game['title']}")
-                logging.info(f"Processing game: {game['title']}")
-                games_processed_count += 1
-
-                # Get current price
-                price_elem = card.select_one('strong')
-                if price_elem:
-                    price_text = price_elem.text.strip()
-                    # 1. Remove currency symbols (like ARS$, $, €) and whitespace
-                    # Keep digits, comma, and dot for now
-                    cleaned_price_str = re.sub(r'[^\d,.]', '', price_text)
-
-                    try:
-                        # Check if the original cleaned string contained a comma (decimal separator)
-                        if ',' in cleaned_price_str:
-                            # Treat '.' as thousands, ',' as decimal
-                            numeric_str = cleaned_price_str.replace('.', '').replace(',', '.')
-                            game['current_price'] = float(numeric_str) if numeric_str else 0.0
-                        # Check if the original cleaned string contained a dot but no comma (e.g., $19.99)
-                        elif '.' in cleaned_price_str:
-                             # Treat '.' as decimal, ignore potential thousands commas if any were missed (shouldn't happen with current regex)
-                             numeric_str = cleaned_price_str.replace(',', '') # Remove commas if any snuck in
-                             game['current_price'] = float(numeric_str) if numeric_str else 0.0
-                        # Only digits found (e.g., "1135000")
-                        elif cleaned_price_str.isdigit():
-                            # Assume last two digits are decimals
-                            if len(cleaned_price_str) >= 2:
-                                numeric_str = cleaned_price_str[:-2] + '.' + cleaned_price_str[-2:]
-                                game['current_price'] = float(numeric_str)
-                            elif len(cleaned_price_str) == 1:
-                                # Treat single digit as dollars/euros/etc. (e.g., "5")
-                                game['current_price'] = float(cleaned_price_str)
-                            else: # Empty string after cleaning
-                                game['current_price'] = 0.0
-                        else: # Handle cases where cleaning resulted in non-standard format
-                             game['current_price'] = 0.0
-                             st.warning(f"Could not parse price for {game['title']} from text '{price_text}' (cleaned: '{cleaned_price_str}' - unexpected format)")
-                             logging.warning(f"Could not parse price for {game['title']} from text '{price_text}' (cleaned: '{cleaned_price_str}' - unexpected format)")
-
-                    except ValueError:
-                        game['current_price'] = 0.0
-                        st.warning(f"Could not parse price for {game['title']} from text '{price_text}' (cleaned: '{cleaned_price_str}') - ValueError")
-                        logging.warning(f"Could not parse price for {game['title']} from text '{price_text}' (cleaned: '{cleaned_price_str}') - ValueError")
-                else:
-                    game['current_price'] = 0.0
-                    st.warning(f"No price found for {game['title']}")
-                    logging.warning(f"No price found for {game['title']}")
-
-                # Get game detail URL
-                detail_elem = card.select_one('.main-link')
-                if detail_elem and detail_elem.get('href'):
-                    detail_url = f"https://www.dekudeals.com{detail_elem['href']}"
-                    game['detail_url'] = detail_url
-                    time.sleep(0.5) # Be polite
-
-                    try:
-                        # --- Detail Page Scraping ---
-                        detail_html = None
-                        # Check cache first even in refresh mode for detail pages to speed up
-                        detail_html_cache = get_html_from_cache(detail_url)
-                        if detail_html_cache:
-                             detail_soup = BeautifulSoup(detail_html_cache, 'html.parser')
-                        else:
-                             detail_response = session.get(detail_url, headers=headers, timeout=15) # Added timeout
-                             detail_response.raise_for_status()
-                             detail_html = detail_response.text
-                             save_html_to_cache(detail_url, detail_html) # Cache detail page
-                             detail_soup = BeautifulSoup(detail_html, 'html.parser')
-
-                        # Scores
-                        metacritic_elem = detail_soup.select_one("li.list-group-item strong:contains('Metacritic') + a")
-                        game['metascore'] = int(metacritic_elem.text.strip()) if metacritic_elem and metacritic_elem.text.strip().isdigit() else None
-
-                        opencritic_elem = detail_soup.select_one("li.list-group-item strong:contains('OpenCritic') + a")
-                        game['openscore'] = int(opencritic_elem.text.strip()) if opencritic_elem and opencritic_elem.text.strip().isdigit() else None
-
-                        # Steam Score (consider caching results here too)
-                        app_id = search_steamdb(game['title']) # search_steamdb uses its own cache
-                        steam_score_str = get_steam_rating(app_id) # get_steam_rating uses its own cache
-                        game['steam_score'] = float(steam_score_str) if steam_score_str else None
-
-                        # Price History
-                        game['last_discount'] = None
-                        game['avg_days_between_discounts'] = None
-                        game['days_since_last_discount'] = None
-                        history_table = detail_soup.select_one('.price-history table')
-                        if history_table:
-                            dates = []
-                            rows = history_table.select('tr')
-                            for row in rows[1:]:
-                                date_cell = row.select_one('td')
-                                if date_cell:
-                                    try:
-                                        # Attempt to parse various date formats robustly
-                                        date_str = date_cell.text.strip()
-                                        if date_str: # Ensure not empty
-                                             dates.append(parser.parse(date_str))
-                                    except Exception as date_e:
-                                        logging.warning(f"Could not parse date '{date_cell.text.strip()}' for {game['title']}: {date_e}")
-                                        continue
-                            if dates:
-                                dates.sort(reverse=True)
-                                game['last_discount'] = dates[0].strftime('%Y-%m-%d')
-                                game['days_since_last_discount'] = (datetime.now() - dates[0]).days
-                                if len(dates) > 1:
-                                    diff_days = [(dates[i] - dates[i+1]).days for i in range(len(dates)-1) if (dates[i] - dates[i+1]).days >= 0] # Ensure positive diff
-                                    if diff_days:
-                                         game['avg_days_between_discounts'] = sum(diff_days) / len(diff_days)
-                        else:
-                            st.warning(f"No price history table found for {game['title']}")
-                            logging.warning(f"No price history table found for {game['title']}")
-
-                    except requests.exceptions.RequestException as e:
-                        st.error(f"Error fetching detail page for {game['title']}: {e}")
-                        logging.error(f"Error fetching detail page for {game['title']}: {e}")
-                        # Don't add game if details failed, but maybe log it?
-                        continue # Skip adding this game
-                    except Exception as detail_e:
-                         st.error(f"Error processing details for {game['title']}: {detail_e}")
-                         logging.error(f"Error processing details for {game['title']}: {detail_e}")
-                         continue # Skip adding this game
-                else:
-                    st.warning(f"No detail URL found for game card: {game.get('title', 'N/A')}")
-                    logging.warning(f"No detail URL found for game card: {game.get('title', 'N/A')}")
-                    # Decide if you want to add games without details
-                    # game['metascore'] = None ... etc.
-                    continue # Skip adding this game for now
-
-                # Only add and save if details were successfully processed
-                all_games.append(game)
-                save_game_to_db(game) # Save the newly scraped game
-
-            # Check for next page link more reliably
-            next_page_link = soup.select_one('a.page-link[rel="next"]') # Standard rel="next"
-            if not next_page_link:
-                 # Fallback check if rel="next" isn't used
-                 current_active = soup.select_one('li.page-item.active span.page-link')
-                 if current_active:
-                      next_li = current_active.find_parent('li').find_next_sibling('li')
-                      if next_li and next_li.select_one('a.page-link'):
-                           next_page_link = next_li.select_one('a.page-link')
-                      else:
-                           next_page_link = None # Truly no next page element found
-                 else:
-                      next_page_link = None # Cannot determine next page
-
-            if not next_page_link:
-                st.write("No next page link found, stopping.")
-                logging.info("No next page link found, stopping.")
-                break
-
-            page += 1
-            # Optional: Add a limit to prevent infinite loops during testing
-            # if page > 5: # Limit to 5 pages for testing
-            #     st.warning("Reached page limit for testing.")
-            #     break
+        games_saved_count = 0
+        # Load every known title once; checking a card is then a set lookup instead of a query
+        existing_titles = {title for (title,) in conn.execute("SELECT title FROM games")}
+        # Stream each page's games into a temporary Parquet file so memory stays flat;
+        # it replaces the cache file once scraping has finished
+        cache_tmp_file = CACHE_FILE + '.tmp'
+        cache_writer = pq.ParquetWriter(cache_tmp_file, GAME_SCHEMA, compression='zstd')
+        try:
+            while True:
+                st.write(f"Fetching page {page}...")
+                url = f"{base_url}?page={page}" if page > 1 else base_url
+
+                # Always fetch from web when force_refresh is True
+                st.write(f"Fetching HTML from {url}")
+                logging.info(f"Fetching HTML from {url}")
+                try:
+                    st.write(f"Sending GET request to: {url}")
+                    html_content = fetch_html(session, url)
+                    st.write(f"Received {len(html_content)} characters of HTML for page {page}")
+                    html_cache_put(url, html_content) # Save fetched HTML
+                    soup = BeautifulSoup(html_content, PARSER, parse_only=LISTING_STRAINER)
+                except requests.exceptions.RequestException as e:
+                    st.error(f"Error fetching page {page}: {e}")
+                    logging.error(f"Error fetching page {page}: {e}")
+                    break # Stop if a page fails
+
+                game_cards = CARD_SELECTOR.select(soup)
+                st.write(f"Found {len(game_cards)} game cards on page {page}")
+                logging.info(f"Found {len(game_cards)} game cards on page {page}")
+
+                if not game_cards:
+                    st.write("No more game cards found, stopping.")
+                    logging.info("No more game cards found, stopping.")
+                    break
+
+                new_cards = []
+                for card in game_cards:
+                    title_elem = CARD_TITLE_SELECTOR.select_one(card)
+                    if not title_elem:
+                        st.warning("Skipping card: No title found.")
+                        logging.warning("Skipping card: No title found.")
+                        continue
+                    title = title_elem.get_text().strip() # Same text as the stored primary keys, nested tags and all
+
+                    # --- Check DB *before* scraping details ---
+                    # This prevents re-scraping details for games already saved.
+                    if title in existing_titles:
+                        st.write(f"Skipping game (already in database): {title}")
+                        logging.info(f"Skipping game (already in database): {title}")
+                        continue # Skip to the next card
+                    existing_titles.add(title) # Also skips duplicate cards later in this run
+
+                    st.write(f"Processing game: {title}")
+                    logging.info(f"Processing game: {title}")
+                    games_processed_count += 1
+                    new_cards.append((card, title))
+
+                # Scrape detail pages concurrently; the work is dominated by network waits.
+                # Worker threads get the script context so their st.* messages still render.
+                ctx = get_script_run_ctx()
+                with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS, initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+                    page_games = list(executor.map(lambda item: process_card(*item, session), new_cards))
+
+                # Only add and save if details were successfully processed, gathered column by column
+                page_columns = {name: [] for name in GAME_SCHEMA.names}
+                for game in page_games:
+                    if game is not None:
+                        for name, values in page_columns.items():
+                            values.append(game.get(name))
+                if page_columns['title']:
+                    # Save the newly scraped games from this thread only, one batch per page
+                    save_games_to_db(page_columns, conn)
+                    cache_writer.write_table(pa.table(page_columns, schema=GAME_SCHEMA))
+                    games_saved_count += len(page_columns['title'])
+
+                # Check for next page link more reliably
+                next_page_link = NEXT_PAGE_SELECTOR.select_one(soup) # Standard rel="next"
+                if not next_page_link:
+                     # Fallback check if rel="next" isn't used
+                     current_active = ACTIVE_PAGE_SELECTOR.select_one(soup)
+                     if current_active:
+                          next_li = current_active.find_parent('li').find_next_sibling('li')
+                          if next_li and PAGE_LINK_SELECTOR.select_one(next_li):
+                               next_page_link = PAGE_LINK_SELECTOR.select_one(next_li)
+                          else:
+                               next_page_link = None # Truly no next page element found
+                     else:
+                          next_page_link = None # Cannot determine next page
+
+                if not next_page_link:
+                    st.write("No next page link found, stopping.")
+                    logging.info("No next page link found, stopping.")
+                    break
+
+                page += 1
+                # Optional: Add a limit to prevent infinite loops during testing
+                # if page > 5: # Limit to 5 pages for testing
+                #     st.warning("Reached page limit for testing.")
+                #     break
+        finally:
+            cache_writer.close()
+        if games_saved_count == 0:
+            os.remove(cache_tmp_file)
 
         # --- Post-Scraping Processing ---
-        if not all_games and games_processed_count == 0:
+        if games_saved_count == 0 and games_processed_count == 0:
              st.warning("Web scraping finished, but no new games were processed or added.")
              logging.warning("Web scraping finished, but no new games were processed or added.")
              # Attempt to load from DB again in case it was populated by another run
              try:
-                  conn = sqlite3.connect(DATABASE_FILE)
-                  df = pd.read_sql_query("SELECT * FROM games", conn)
-                  conn.close()
+                  df = read_games_table(conn)
                   if not df.empty:
                        st.info("Loaded data from existing database after scraping yielded no new games.")
                        logging.info("Loaded data from existing database after scraping yielded no new games.")
-                       # Ensure types
-                       df['current_price'] = pd.to_numeric(df['current_price'], errors='coerce').fillna(0)
-                       for col in ['metascore', 'openscore', 'steam_score', 'days_since_last_discount']:
-                            df[col] = pd.to_numeric(df[col], errors='coerce')
-                       df['avg_days_between_discounts'] = pd.to_numeric(df['avg_days_between_discounts'], errors='coerce')
                        return df
                   else:
                        return pd.DataFrame() # Return empty df if still nothing
@@ -518,7 +792,7 @@ def get_game_data(base_url, force_refresh=False):
                   logging.error(f"Failed to load from database after scraping: {e}")
                   return pd.DataFrame() # Return empty df on error
 
-        elif not all_games and games_processed_count > 0:
+        elif games_saved_count == 0 and games_processed_count > 0:
              st.error("Web scraping processed games but resulted in an empty list. Check logs for errors during detail processing.")
              logging.error("Web scraping processed games but resulted in an empty list.")
              return pd.DataFrame() # Return empty df
@@ -526,26 +800,21 @@ def get_game_data(base_url, force_refresh=False):
         else:
              # Combine newly scraped games with existing DB data if needed?
              # For now, just return the newly scraped ones.
-             df = pd.DataFrame(all_games)
+             # Column types come from GAME_SCHEMA, so no conversion is needed
+             df = read_game_cache(cache_tmp_file)
              st.success(f"Web scraping complete. Processed {games_processed_count} new games.")
              logging.info(f"Web scraping complete. Processed {games_processed_count} new games.")
 
-             # Save the newly scraped data to CSV cache as well
+             # Promote the streamed scrape results to the Parquet cache
              try:
                  # Optional: Load existing cache, append, drop duplicates, save
                  # Or just overwrite cache with the latest scrape results
-                 df.to_csv(CACHE_FILE, index=False)
-                 st.info("Updated CSV cache with newly scraped data.")
-                 logging.info("Updated CSV cache with newly scraped data.")
+                 os.replace(cache_tmp_file, CACHE_FILE)
+                 st.info("Updated Parquet cache with newly scraped data.")
+                 logging.info("Updated Parquet cache with newly scraped data.")
              except Exception as e:
-                 st.error(f"Error saving updated CSV cache: {e}")
-                 logging.error(f"Error saving updated CSV cache: {e}")
-
-             # Ensure correct types before returning
-             df['current_price'] = pd.to_numeric(df['current_price'], errors='coerce').fillna(0)
-             for col in ['metascore', 'openscore', 'steam_score', 'days_since_last_discount']:
-                  df[col] = pd.to_numeric(df[col], errors='coerce')
-             df['avg_days_between_discounts'] = pd.to_numeric(df['avg_days_between_discounts'], errors='coerce')
+                 st.error(f"Error saving updated Parquet cache: {e}")
+                 logging.error(f"Error saving updated Parquet cache: {e}")
              return df
 
     # Should not be reached if logic is correct, but return empty DF as fallback
@@ -553,169 +822,218 @@ def get_game_data(base_url, force_refresh=False):
     logging.error("Reached end of get_game_data without returning data.")
     return pd.DataFrame()
 
+def hash_game_data(df):
+    """Content hash of a games DataFrame, used as a cheap cache key for its recommendations"""
+    # xxh3 over whole column buffers instead of pandas' per-row hashing
+    digest = xxhash.xxh3_128(len(df).to_bytes(8, 'little'))
+    for name, col in df.items():
+        digest.update(name.encode('utf-8'))
+        if pd.api.types.is_numeric_dtype(col):
+            # One float64 layout for every numeric dtype, with missing values (NaN or <NA>) as NaN
+            digest.update(col.to_numpy(dtype=np.float64, na_value=np.nan).tobytes())
+        else:
+            # Missing values as a mask, so None (object columns from SQLite) and NaN (str columns from Parquet) hash the same
+            missing = col.isna().to_numpy()
+            digest.update(np.packbits(missing).tobytes())
+            digest.update('\x1f'.join(map(str, col[~missing].tolist())).encode('utf-8'))
+    return digest.digest()
+
+@st.cache_data(ttl=3600, max_entries=8, show_spinner=False)
+def cached_analyze_and_recommend(df_hash, _df):
+    """Recommendations for _df, memoized on its precomputed content hash instead of hashing the frame on every call"""
+    return analyze_and_recommend(_df)
+
+def recommend_with_db_cache(df, df_hash, conn, latest=None):
+    """Recommendations for df (whose hash_game_data is df_hash), reusing ones persisted by an earlier session when it is unchanged.
+
+    latest is an already read (raw_hash, recommendations) pair from read_latest_recommendations; without it
+    the persisted entry is looked up by key. Only the latest entry is kept, so a different hash is a miss.
+    """
+    raw_hash = hashlib.blake2b(ANALYSIS_VERSION.to_bytes(4, 'little') + df_hash, digest_size=16).digest()
+    if latest is None:
+        recommendations = load_recommendations(raw_hash, conn)
+    else:
+        recommendations = latest[1] if latest[0] == raw_hash else None
+    if recommendations is None:
+        recommendations = cached_analyze_and_recommend(df_hash, df)
+        save_recommendations(raw_hash, recommendations, conn)
+    return recommendations
+
 def analyze_and_recommend(df):
-    # Convert price and scores to numeric values
-    df['current_price'] = pd.to_numeric(df['current_price'], errors='coerce').fillna(0)
-    for col in ['metascore', 'openscore', 'steam_score']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # Calculate average score
-    df['avg_score'] = df[['metascore', 'openscore', 'steam_score']].mean(axis=1)
-    
+    """Score and rank games; returns a new sorted frame and never modifies df, so callers needn't copy it"""
+    # Convert price and scores to numeric values once; loaders usually hand over numeric columns already
+    numeric = df[['current_price', 'metascore', 'openscore', 'steam_score', 'days_since_last_discount']].apply(
+        lambda col: col if pd.api.types.is_numeric_dtype(col) else pd.to_numeric(col, errors='coerce')
+    )
+    current_price = numeric['current_price'].fillna(0)
+    prices = current_price.to_numpy(dtype=np.float32)
+    scores = numeric[['metascore', 'openscore', 'steam_score']].to_numpy(dtype=np.float32, na_value=np.nan)
+    days_since_discount = numeric['days_since_last_discount'].fillna(365).to_numpy(dtype=np.float32)
+
+    # Calculate average score, ignoring missing scores (NaN when a game has none)
+    score_counts = np.count_nonzero(~np.isnan(scores), axis=1)
+    avg_score = np.divide(
+        np.nansum(scores, axis=1), score_counts,
+        out=np.full(len(scores), np.nan, dtype=np.float32), where=score_counts > 0
+    )
+
     # Normalize scores and prices
-    max_price = df['current_price'].max()
+    max_price = prices.max(initial=0)
     if max_price > 0:
-        df['normalized_price'] = 1 - (df['current_price'] / max_price)
+        normalized_price = 1 - (prices / max_price)
     else:
-        df['normalized_price'] = 0
-    
-    score_range = df['avg_score'].max() - df['avg_score'].min()
+        normalized_price = np.zeros_like(prices)
+
+    known_scores = avg_score[~np.isnan(avg_score)]
+    score_range = known_scores.max() - known_scores.min() if known_scores.size else 0
     if score_range > 0:
-        df['normalized_score'] = (df['avg_score'] - df['avg_score'].min()) / score_range
+        normalized_score = (avg_score - known_scores.min()) / score_range
     else:
-        df['normalized_score'] = 0
-    
+        normalized_score = np.zeros_like(avg_score)
+
     # Calculate discount probability
-    df['days_since_last_discount'] = pd.to_numeric(df['days_since_last_discount'], errors='coerce').fillna(365)
-    df['discount_probability'] = 1 / (df['days_since_last_discount'] + 1)
-    
+    discount_probability = 1 / (days_since_discount + 1)
+
     # Calculate recommendation score
-    df['recommendation_score'] = (
-        0.4 * df['normalized_score'].fillna(0) +  # Higher weight for game quality
-        0.3 * df['normalized_price'].fillna(0) +  # Price value
-        0.3 * df['discount_probability'].fillna(0)  # Likelihood of future discount
+    recommendation_score = (
+        0.4 * np.nan_to_num(normalized_score) +  # Higher weight for game quality
+        0.3 * normalized_price +  # Price value
+        0.3 * discount_probability  # Likelihood of future discount
     )
-    
-    return df.sort_values('recommendation_score', ascending=False)
 
-def display_results(wishlist_df, recommendations):
-    """Displays the processed data in a scrollable container."""
-    # --- Debug Start ---
-    st.write("--- Debug: Entering display_results ---")
+    return df.assign(
+        current_price=current_price,
+        metascore=numeric['metascore'],
+        openscore=numeric['openscore'],
+        steam_score=numeric['steam_score'],
+        days_since_last_discount=days_since_discount,
+        avg_score=avg_score,
+        normalized_price=normalized_price,
+        normalized_score=normalized_score,
+        discount_probability=discount_probability,
+        recommendation_score=recommendation_score,
+    ).astype(RECOMMENDATION_DTYPES).sort_values('recommendation_score', ascending=False, kind='mergesort')
+
+def top_n(df, key, columns, n=5):
+    """The n rows with the largest key, projected to columns; ranks on the key column alone so the rest is only read for those rows"""
+    return df.loc[df[key].nlargest(n).index, columns]
+
+@st.cache_resource(ttl=3600, max_entries=8, show_spinner=False)
+def stored_recommendations(key, _df=None):
+    """Recommendations shared by all sessions, by the hash_game_data key of their raw data; pass _df to store it, omit it to look it up.
+
+    Raises KeyError for a key with nothing stored; exceptions aren't cached, so a failed lookup leaves the slot empty.
+    """
+    if _df is None:
+        raise KeyError(key)
+    return _df
+
+def store_results(key, recommendations):
+    """Put recommendations in the shared store; the session keeps only their key and top-5 rankings"""
+    stored_recommendations(key, recommendations)
+    st.session_state.processed_key = key
+    st.session_state.top_games = rank_categories(recommendations)
+
+def rank_categories(recommendations):
+    """Row labels of the top 5 games per ranked category column, computed once per set of recommendations"""
+    return {
+        col: recommendations[col].nlargest(5).index
+        for col in ('discount_probability', 'avg_score') if col in recommendations.columns
+    }
+
+@st.fragment
+def display_results(recommendations, top_games=None):
+    """Displays the processed data in a scrollable container; top_games comes from rank_categories(recommendations)."""
     if recommendations is None:
-        st.write("Debug: 'recommendations' DataFrame is None.")
+        logging.debug("'recommendations' DataFrame is None.")
         return # Cannot proceed if recommendations are None
     elif recommendations.empty:
-        st.write("Debug: 'recommendations' DataFrame is empty.")
+        logging.debug("'recommendations' DataFrame is empty.")
     else:
-        st.write(f"Debug: 'recommendations' columns: {recommendations.columns.tolist()}")
-        st.write("Debug: 'recommendations' head:")
-        st.dataframe(recommendations.head(2)) # Show a couple of rows for inspection
-    # --- Debug End ---
+        logging.debug(f"'recommendations' columns: {recommendations.columns.tolist()}")
+    # analyze_and_recommend guarantees a float price column, so the price comparisons below stay vectorized
+    assert recommendations['current_price'].dtype.kind == 'f', recommendations['current_price'].dtype
+    if top_games is None:
+        top_games = rank_categories(recommendations)
+    cols = frozenset(recommendations.columns) # Built once for the column checks below
 
     with st.container(height=600): # You can adjust the height as needed
-        # Display raw data
-        st.subheader('Raw Data')
-        # --- Debug Start ---
-        if wishlist_df is None:
-             st.write("Debug: 'wishlist_df' is None.")
-        elif wishlist_df.empty:
-             st.write("Debug: 'wishlist_df' is empty.")
-        else:
-             st.write("Debug: Displaying Raw Data...")
-             st.dataframe(wishlist_df[['title', 'current_price', 'metascore', 'openscore', 'steam_score', 'last_discount', 'days_since_last_discount']].head(2))
-        # --- Debug End ---
-        # Original line: st.dataframe(wishlist_df[['title', ...]]) # Keep original display if needed
-
         # Display recommendations
         st.header('Recommendations')
         st.write("Here are your game recommendations, sorted by best value:")
-        display_cols = [
-            'title', 'current_price', 'avg_score',
-            'days_since_last_discount', 'avg_days_between_discounts',
-            'recommendation_score'
-        ]
-        # --- Debug Start ---
-        st.write("Debug: Checking columns for Recommendations Table...")
-        missing_display_cols = [col for col in display_cols if col not in recommendations.columns]
+        logging.debug("Checking columns for Recommendations Table...")
+        missing_display_cols = [col for col in DISPLAY_COLS if col not in cols]
         if not missing_display_cols:
-             st.write("Debug: Displaying Recommendations Table...")
-             st.dataframe(recommendations[display_cols])
+             logging.debug("Displaying Recommendations Table...")
+             st.dataframe(recommendations[DISPLAY_COLS], hide_index=True, column_config=COLUMN_CONFIG)
         else:
-             st.warning(f"Debug: Cannot display recommendations table. Missing columns: {missing_display_cols}")
-        # --- Debug End ---
+             st.warning(f"Cannot display recommendations table. Missing columns: {missing_display_cols}")
 
         # Display statistical insights
         st.header('Statistical Insights')
         st.write(f"Total games in wishlist: {len(recommendations)}")
-        # --- Debug Start ---
-        st.write("Debug: Calculating Averages...")
-        # --- Debug End ---
-        # Calculate averages for filtering
-        avg_price = None
-        if 'current_price' in recommendations.columns and pd.api.types.is_numeric_dtype(recommendations['current_price']) and recommendations['current_price'].notna().any():
-            avg_price = recommendations['current_price'].mean()
+        logging.debug("Calculating Averages...")
+        # Calculate averages for filtering in one pass; columns that are missing, non-numeric or all NaN are left out
+        stats = recommendations[recommendations.columns.intersection(
+            ['current_price', 'avg_score', 'metascore', 'avg_days_between_discounts']
+        )].select_dtypes('number').agg(['mean', 'count'])
+        averages = {col: stats.at['mean', col] for col in stats.columns if stats.at['count', col] > 0}
+
+        avg_price = averages.get('current_price')
+        if avg_price is not None:
             st.write(f"Average price of games: ARS${avg_price:.2f}")
         else:
             st.write("Average price calculation skipped (column missing, non-numeric, or all NaN).")
-        # --- Debug Start ---
-        st.write(f"Debug: avg_price = {avg_price}")
-        # --- Debug End ---
+        logging.debug(f"avg_price = {avg_price}")
 
-        avg_overall_score = None
-        if 'avg_score' in recommendations.columns and pd.api.types.is_numeric_dtype(recommendations['avg_score']) and recommendations['avg_score'].notna().any():
-             avg_overall_score = recommendations['avg_score'].mean()
+        avg_overall_score = averages.get('avg_score')
+        if avg_overall_score is not None:
              # Display other averages if needed
-             if 'metascore' in recommendations.columns and pd.api.types.is_numeric_dtype(recommendations['metascore']) and not recommendations['metascore'].isna().all():
-                 st.write(f"Average metascore: {recommendations['metascore'].mean():.1f}")
-             if 'avg_days_between_discounts' in recommendations.columns and pd.api.types.is_numeric_dtype(recommendations['avg_days_between_discounts']) and not recommendations['avg_days_between_discounts'].isna().all():
-                 st.write(f"Average days between discounts: {recommendations['avg_days_between_discounts'].mean():.1f}")
+             if 'metascore' in averages:
+                 st.write(f"Average metascore: {averages['metascore']:.1f}")
+             if 'avg_days_between_discounts' in averages:
+                 st.write(f"Average days between discounts: {averages['avg_days_between_discounts']:.1f}")
         else:
              st.write("Average score calculation skipped (column missing, non-numeric, or all NaN).")
-        # --- Debug Start ---
-        st.write(f"Debug: avg_overall_score = {avg_overall_score}")
-        # --- Debug End ---
+        logging.debug(f"avg_overall_score = {avg_overall_score}")
 
 
         # Show top recommendations by category
         st.subheader("Top Games by Category")
-        # --- Debug Start ---
-        st.write("Debug: Checking conditions for Category Display...")
-        # --- Debug End ---
+        logging.debug("Checking conditions for Category Display...")
 
         st.write("Best Value Games (High Score, Low Price - Top 5 Overall):")
         if not recommendations.empty:
-            # --- Debug Start ---
-            st.write("Debug: Displaying Best Value Games...")
-            # --- Debug End ---
-            value_games = recommendations.head(5)[['title', 'current_price', 'avg_score', 'recommendation_score']]
-            st.dataframe(value_games)
+            logging.debug("Displaying Best Value Games...")
+            value_games = recommendations.head(5)[VALUE_COLS]
+            st.dataframe(value_games, hide_index=True, column_config=COLUMN_CONFIG)
         else:
             st.write("No recommendations to display for Best Value.")
 
 
         st.write("Most Likely to be Discounted Soon:")
-        # Ensure 'discount_probability' exists before sorting
-        if 'discount_probability' in recommendations.columns:
-            # --- Debug Start ---
-            st.write("Debug: Displaying Discounted Soon Games...")
-            # --- Debug End ---
-            discount_games = recommendations.sort_values('discount_probability', ascending=False).head(5)[
-                ['title', 'current_price', 'days_since_last_discount', 'avg_days_between_discounts']]
-            st.dataframe(discount_games)
+        # Ensure 'discount_probability' was ranked
+        if 'discount_probability' in top_games:
+            logging.debug("Displaying Discounted Soon Games...")
+            discount_games = recommendations.loc[top_games['discount_probability'], DISCOUNT_COLS]
+            st.dataframe(discount_games, hide_index=True, column_config=COLUMN_CONFIG)
         else:
-            # --- Debug Start ---
-            st.write("Debug: Discount probability data not available.")
-            # --- Debug End ---
+            logging.debug("Discount probability data not available.")
             st.write("Discount probability data not available.")
 
         # New Category: Below Average Price, Above Average Rating
         st.write("Good Deals (Below Avg Price, Above Avg Rating):")
-        good_deals_condition = avg_price is not None and avg_overall_score is not None and 'avg_score' in recommendations.columns and 'current_price' in recommendations.columns
-        # --- Debug Start ---
-        st.write(f"Debug: Good Deals condition check: avg_price={avg_price}, avg_overall_score={avg_overall_score}, has 'avg_score'={'avg_score' in recommendations.columns}, has 'current_price'={'current_price' in recommendations.columns} -> {good_deals_condition}")
-        # --- Debug End ---
+        good_deals_condition = avg_price is not None and avg_overall_score is not None and 'avg_score' in cols and 'current_price' in cols
+        logging.debug(f"Good Deals condition check: avg_price={avg_price}, avg_overall_score={avg_overall_score}, has 'avg_score'={'avg_score' in cols}, has 'current_price'={'current_price' in cols} -> {good_deals_condition}")
         if good_deals_condition:
-            good_deals = recommendations[
-                (recommendations['current_price'] < avg_price) &
-                (recommendations['avg_score'] > avg_overall_score)
-            ].sort_values('recommendation_score', ascending=False).head(5) # Sort by recommendation score
+            # query evaluates both comparisons in one fused numexpr pass when numexpr is installed
+            good_deals = top_n(recommendations.query(
+                'current_price < @avg_price and avg_score > @avg_overall_score'
+            ), 'recommendation_score', VALUE_COLS) # Top 5 by recommendation score
 
             if not good_deals.empty:
-                # --- Debug Start ---
-                st.write("Debug: Displaying Good Deals Games...")
-                # --- Debug End ---
-                st.dataframe(good_deals[['title', 'current_price', 'avg_score', 'recommendation_score']])
+                logging.debug("Displaying Good Deals Games...")
+                st.dataframe(good_deals, hide_index=True, column_config=COLUMN_CONFIG)
             else:
                 st.write("No games found matching this criteria.")
         else:
@@ -723,18 +1041,13 @@ def display_results(wishlist_df, recommendations):
 
 
         st.write("Highest Rated Games:")
-        # Ensure 'avg_score' exists before sorting
-        if 'avg_score' in recommendations.columns:
-             # --- Debug Start ---
-             st.write("Debug: Displaying Highest Rated Games...")
-             # --- Debug End ---
-             top_rated = recommendations.sort_values('avg_score', ascending=False).head(5)[
-                ['title', 'current_price', 'metascore', 'openscore', 'steam_score', 'avg_score']]
-             st.dataframe(top_rated)
+        # Ensure 'avg_score' was ranked
+        if 'avg_score' in top_games:
+             logging.debug("Displaying Highest Rated Games...")
+             top_rated = recommendations.loc[top_games['avg_score'], RATED_COLS]
+             st.dataframe(top_rated, hide_index=True, column_config=COLUMN_CONFIG)
         else:
-             # --- Debug Start ---
-             st.write("Debug: Average score data not available for Highest Rated.")
-             # --- Debug End ---
+             logging.debug("Average score data not available for Highest Rated.")
              st.write("Average score data not available.")
 
 
@@ -744,50 +1057,52 @@ def main():
 
     # --- Attempt initial load from DB ---
     initial_data_loaded = False
-    if 'processed_data' not in st.session_state: # Only try initial load once per session
+    if 'processed_key' not in st.session_state: # Only try initial load once per session
+        conn = None
         try:
-            conn = sqlite3.connect(DATABASE_FILE)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM games")
-            count = cursor.fetchone()[0]
-            conn.close()
-            if count > 0:
+            # One connection for both the existence check and the load
+            conn = open_database()
+            data_version = game_data_version(conn)
+            if data_version[0] > 0:
                 st.write("Found existing data in database, attempting initial load...")
                 logging.info("Found existing data in database, attempting initial load...")
+                # Read the persisted recommendations in the background while the games load
+                prefetch = ThreadPoolExecutor(max_workers=1)
+                latest_future = prefetch.submit(read_latest_recommendations)
+                prefetch.shutdown(wait=False)
                 # Use get_game_data with force_refresh=False to prioritize DB
-                initial_df = get_game_data(wishlist_url, force_refresh=False)
+                initial_df = load_game_data(wishlist_url, False, data_version, _conn=conn)
                 if initial_df is not None and not initial_df.empty:
-                    st.session_state.raw_data = initial_df
-                    st.session_state.processed_data = analyze_and_recommend(initial_df.copy())
+                    key = hash_game_data(initial_df)
+                    store_results(key, recommend_with_db_cache(initial_df, key, conn, latest_future.result()))
                     st.success("Initial data loaded and processed from database.")
                     logging.info("Initial data loaded and processed from database.")
                     initial_data_loaded = True
                 else:
                     st.warning("Database has entries, but failed to load/process initial data.")
+                    load_game_data.clear() # Don't keep serving the failed load from cache
                     logging.warning("Database has entries, but failed to load/process initial data.")
                     # Ensure session state is initialized if initial load fails
-                    st.session_state.processed_data = None
-                    st.session_state.raw_data = None
+                    st.session_state.processed_key = None
             else:
                  st.info("Database is empty. Use processing options to fetch data.")
                  logging.info("Database is empty on initial check.")
                  # Ensure session state is initialized if DB is empty
-                 st.session_state.processed_data = None
-                 st.session_state.raw_data = None
+                 st.session_state.processed_key = None
         except Exception as e:
             st.error(f"Error during initial database check/load: {e}")
             logging.error(f"Error during initial database check/load: {e}")
             # Ensure session state is initialized on error
-            st.session_state.processed_data = None
-            st.session_state.raw_data = None
+            st.session_state.processed_key = None
+        finally:
+            if conn is not None:
+                conn.close()
     # --- End initial load attempt ---
 
 
     # Initialize session state (if not already set by initial load)
-    if 'processed_data' not in st.session_state:
-        st.session_state.processed_data = None
-    if 'raw_data' not in st.session_state:
-        st.session_state.raw_data = None
+    if 'processed_key' not in st.session_state:
+        st.session_state.processed_key = None
     if 'show_processing_options' not in st.session_state:
         # Only hide options initially if data was loaded successfully
         st.session_state.show_processing_options = not initial_data_loaded
@@ -803,79 +1118,73 @@ def main():
             if st.button("Process using Cache/DB"): # Renamed for clarity
                 with st.spinner("Processing using cache/DB..."):
                     # Clear previous results before processing
-                    st.session_state.raw_data = None
-                    st.session_state.processed_data = None
-                    wishlist_df = get_game_data(wishlist_url, force_refresh=False)
+                    st.session_state.processed_key = None
+                    conn = open_database()
+                    try:
+                        wishlist_df = load_game_data(wishlist_url, False, game_data_version(conn), _conn=conn)
+                    finally:
+                        conn.close()
                     if wishlist_df is not None and not wishlist_df.empty:
-                        recommendations = analyze_and_recommend(wishlist_df.copy())
-                        st.session_state.raw_data = wishlist_df
-                        st.session_state.processed_data = recommendations
+                        key = hash_game_data(wishlist_df)
+                        store_results(key, cached_analyze_and_recommend(key, wishlist_df))
                         st.success("Processing complete using cache/DB.")
                     else:
                         st.error("No games found or error during processing (Cache/DB).")
+                        load_game_data.clear() # Don't keep serving the failed load from cache
                         # Ensure state reflects failure
-                        st.session_state.raw_data = None
-                        st.session_state.processed_data = None
+                        st.session_state.processed_key = None
                 st.session_state.show_processing_options = False # Hide buttons after processing
 
         with col2:
             if st.button("Process from Scratch (Refresh Web Data)"):
                  with st.spinner("Processing and refreshing data from web..."):
                     # Clear previous results before processing
-                    st.session_state.raw_data = None
-                    st.session_state.processed_data = None
+                    st.session_state.processed_key = None
+                    # Drop memoized loads; the refresh itself is never served from cache
+                    load_game_data.clear()
+                    cached_analyze_and_recommend.clear()
                     wishlist_df = get_game_data(wishlist_url, force_refresh=True)
                     if wishlist_df is not None and not wishlist_df.empty:
-                        recommendations = analyze_and_recommend(wishlist_df.copy())
-                        st.session_state.raw_data = wishlist_df
-                        st.session_state.processed_data = recommendations
+                        key = hash_game_data(wishlist_df)
+                        store_results(key, cached_analyze_and_recommend(key, wishlist_df))
                         st.success("Processing complete with refreshed data.")
                     else:
                         st.error("No games found or error during processing (Refresh).")
                         # Ensure state reflects failure
-                        st.session_state.raw_data = None
-                        st.session_state.processed_data = None
+                        st.session_state.processed_key = None
                  st.session_state.show_processing_options = False # Hide buttons after processing
 
     # Display results if data has been processed and exists
-    # --- Debug Start ---
-    st.write(f"--- Debug: Checking display condition ---")
-    st.write(f"Debug: processed_data is None: {st.session_state.processed_data is None}")
-    st.write(f"Debug: raw_data is None: {st.session_state.raw_data is None}")
-    st.write(f"Debug: show_processing_options: {st.session_state.show_processing_options}")
-    # --- Debug End ---
-
-    if st.session_state.processed_data is not None and st.session_state.raw_data is not None:
+    logging.debug(
+        f"Checking display condition: processed_key is None: {st.session_state.processed_key is None}, "
+        f"show_processing_options: {st.session_state.show_processing_options}"
+    )
+
+    if st.session_state.processed_key is not None:
         st.markdown("---") # Add a separator
-        # --- Debug Start ---
-        st.write("--- Debug: Calling display_results ---")
-        # --- Debug End ---
-        display_results(st.session_state.raw_data, st.session_state.processed_data)
+        try:
+            recommendations = stored_recommendations(st.session_state.processed_key)
+        except KeyError:
+            # Evicted from the shared store; forget the key so the next run loads the data again
+            logging.info("Session results were evicted from the shared store, reloading.")
+            del st.session_state.processed_key
+            st.rerun()
+        logging.debug("Calling display_results")
+        display_results(recommendations, st.session_state.get('top_games'))
     # Optionally, add a message if processing was attempted but failed OR if no initial data and no processing done yet
-    elif st.session_state.processed_data is None and not st.session_state.show_processing_options:
-         # --- Debug Start ---
-         st.write("--- Debug: Displaying 'Processing finished, no data' message ---")
-         # --- Debug End ---
+    elif st.session_state.processed_key is None and not st.session_state.show_processing_options:
+         logging.debug("Displaying 'Processing finished, no data' message")
          # Check if initial load was attempted and failed vs just no data yet
-         if not initial_data_loaded and 'raw_data' in st.session_state and st.session_state.raw_data is None: # Check if state exists but is None
+         if not initial_data_loaded:
               st.info("No data loaded. Use processing options above.")
-         elif initial_data_loaded and st.session_state.processed_data is None: # Initial load happened but failed processing?
+         elif initial_data_loaded and st.session_state.processed_key is None: # Initial load happened but failed processing?
               st.warning("Initial data loaded but processing failed or resulted in no recommendations.")
          else: # Covers cases where processing buttons were clicked but failed
               st.info("Processing finished, but no data was generated or found. Cannot display results.")
 
     elif st.session_state.show_processing_options:
-         # --- Debug Start ---
-         st.write("--- Debug: Displaying 'Select processing option' message ---")
-         # --- Debug End ---
+         logging.debug("Displaying 'Select processing option' message")
          st.info("Select a processing option above.") # Initial state or after clicking main button
-    # Add a case for when options are hidden but data is missing (might overlap with the first elif)
-    elif st.session_state.raw_data is None and not st.session_state.show_processing_options:
-         # --- Debug Start ---
-         st.write("--- Debug: Displaying 'Processing finished, raw data missing' message ---")
-         # --- Debug End ---
-         # This case might be redundant with the other elif, but kept for debug clarity
-         st.info("No data available to display. Use 'Process Wishlist Data' button.")
 
 
 if __name__ == "__main__":